@@ -76,10 +76,6 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 ]
 
-REST_FRAMEWORK = {
-    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
-}
-
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -1,14 +1,70 @@
+import asyncio
+import atexit
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from math import ceil
 from decouple import config
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import hashlib
 import logging
+import orjson
+import re
 
 logger = logging.getLogger(__name__)
 
+_DEFAULT_TOKEN = config('GEOAPIFY_TOKEN', default=None)
+_GEOCODE_URL = "https://api.geoapify.com/v1/geocode/search"
+_ROUTE_URL = "https://api.geoapify.com/v1/routing"
+
+# Concurrent Geoapify calls per process; the HTTP pool is sized to match so
+# every in-flight request can keep its connection alive
+_MAX_CONCURRENT_REQUESTS = 16
+
+
+def _build_session():
+    """Build a pooled keep-alive session so repeat API calls reuse TLS connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=_MAX_CONCURRENT_REQUESTS,
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by every simulator in the worker process
+_SESSION = _build_session()
+_IO_POOL = ThreadPoolExecutor(max_workers=_MAX_CONCURRENT_REQUESTS, thread_name_prefix="geoapify")
+atexit.register(_IO_POOL.shutdown, wait=False)
+# Runs simulations for async callers; each one holds a thread for its whole run
+_SIMULATION_POOL = ThreadPoolExecutor(max_workers=_MAX_CONCURRENT_REQUESTS, thread_name_prefix="simulate")
+atexit.register(_SIMULATION_POOL.shutdown, wait=False)
+
+GEOCODE_CACHE_TTL = 60 * 60 * 24
+ROUTE_CACHE_TTL = 60 * 60 * 24
+
+
+def _geocode_cache_key(address):
+    """Cache key for an address, insensitive to case and whitespace"""
+    normalized = re.sub(r"\s+", " ", address.strip().lower())
+    # Hash so arbitrary user input is always a valid cache key
+    return "geo:" + hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def _route_cache_key(start_coords, end_coords, waypoints=None):
+    """Cache key for a route, with points rounded to 4 decimals (~11 m)"""
+    points = [start_coords, *(waypoints or []), end_coords]
+    # v2: distances are cached in miles (units=imperial), v1 entries held metres
+    return "route:v2:" + "|".join(f"{round(lat, 4)},{round(lon, 4)}" for lat, lon in points)
+
 class TripSimulator:
     def __init__(self, geoapify_token=None, current_cycle_used=0):
-        self.geoapify_token = geoapify_token or config('GEOAPIFY_TOKEN', default=None)
+        self.geoapify_token = geoapify_token or _DEFAULT_TOKEN
+        self.session = _SESSION
         if not self.geoapify_token:
             raise ValueError("Geoapify token is required")
         
@@ -23,67 +79,115 @@ class TripSimulator:
         self.dropoff_time = 1
 
     def geocode(self, address):
-        """Geocode address and return (lat, lon)"""
-        url = "https://api.geoapify.com/v1/geocode/search"
-        params = {"text": address, "apiKey": self.geoapify_token}
+        """Geocode address and return (lat, lon), served from cache when possible"""
+        return cache.get_or_set(
+            _geocode_cache_key(address),
+            lambda: self._fetch_geocode(address),
+            GEOCODE_CACHE_TTL
+        )
+
+    def geocode_batch(self, addresses):
+        """Geocode several addresses and return their (lat, lon) in input order"""
+        if len(addresses) == 1:
+            return [self.geocode(addresses[0])]
+
+        # Addresses that normalize to the same cache key are looked up once,
+        # cache hits in a single round trip
+        keys = [_geocode_cache_key(address) for address in addresses]
+        coords = cache.get_many(set(keys))
+
+        # One representative address per missing key
+        misses = {}
+        for address, key in zip(addresses, keys):
+            if key not in coords:
+                misses.setdefault(key, address)
+        if misses:
+            # get_many() already reported these absent, so fetch directly and
+            # store them in one round trip rather than via get_or_set() per key
+            fetched = dict(zip(misses, _IO_POOL.map(self._fetch_geocode, misses.values())))
+            cache.set_many(fetched, GEOCODE_CACHE_TTL)
+            coords.update(fetched)
+
+        return [coords[key] for key in keys]
+
+    def _fetch_geocode(self, address):
+        """Geocode address against the Geoapify API and return (lat, lon)"""
+        # Only the best match is used; the plain JSON format skips the GeoJSON feature wrapper
+        params = {"text": address, "limit": 1, "format": "json", "apiKey": self.geoapify_token}
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(_GEOCODE_URL, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
-            features = data.get("features", [])
-            if not features:
+            data = orjson.loads(response.content)
+            results = data.get("results", [])
+            if not results:
                 raise ValueError(f"No results found for address: {address}")
 
-            # Geoapify returns [lon, lat] - convert to (lat, lon)
-            coords = features[0]["geometry"]["coordinates"]
-            return (coords[1], coords[0])  # return (lat, lon)
+            return (results[0]["lat"], results[0]["lon"])
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Geocoding API error for {address}: {e}")
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            logger.error("Geocoding API error for %s: %s", address, e)
             raise ValueError(f"Geocoding failed: {str(e)}")
 
     def get_route(self, start_coords, end_coords, waypoints=None):
-        """Get route between coordinates using correct Geoapify routing format"""
-        # Geoapify routing expects coordinates in lat,lon format (not lon,lat)
-        waypoints_list = [
-            f"{start_coords[0]},{start_coords[1]}",  # lat,lon of start
-            f"{end_coords[0]},{end_coords[1]}"       # lat,lon of end
-        ]
-        
-        # Add intermediate waypoints if any
-        if waypoints:
-            for wp in waypoints:
-                waypoints_list.insert(-1, f"{wp[0]},{wp[1]}")  # Insert before the last point
+        """Get route between coordinates, served from cache when possible"""
+        # Already there (e.g. driver on site at pickup) - no need to ask the API
+        if not waypoints:
+            d2 = (start_coords[0] - end_coords[0]) ** 2 + (start_coords[1] - end_coords[1]) ** 2
+            # d2 is in squared degrees: 1e-10 is a 1e-5 degree radius, ~1 m at the equator
+            if d2 < 1e-10:
+                return {
+                    "geojson": {
+                        "type": "LineString",
+                        "coordinates": [
+                            [start_coords[1], start_coords[0]],
+                            [end_coords[1], end_coords[0]]
+                        ]
+                    },
+                    "distance": 0.0,
+                    "duration": 0.0,
+                    "fuel_locations": []
+                }
 
-        # Join waypoints with the correct format
-        waypoints_param = "|".join(waypoints_list)
+        return cache.get_or_set(
+            _route_cache_key(start_coords, end_coords, waypoints),
+            lambda: self._fetch_route(start_coords, end_coords, waypoints),
+            ROUTE_CACHE_TTL
+        )
+
+    def _fetch_route(self, start_coords, end_coords, waypoints=None):
+        """Get route between coordinates using correct Geoapify routing format"""
+        # Geoapify routing expects coordinates in lat,lon format (not lon,lat),
+        # start first, then any intermediate waypoints, then the end
+        points = [start_coords, *(waypoints or []), end_coords]
+        waypoints_param = "|".join(f"{lat},{lon}" for lat, lon in points)
 
-        url = "https://api.geoapify.com/v1/routing"
         params = {
             "waypoints": waypoints_param,
             "mode": "drive",
+            "format": "geojson",
+            "units": "imperial",  # distances come back in miles
             "apiKey": self.geoapify_token
         }
 
-        logger.debug(f"Routing request - URL: {url}, waypoints: {waypoints_param}")
+        logger.debug("Routing request - URL: %s, waypoints: %s", _ROUTE_URL, waypoints_param)
 
         try:
-            response = requests.get(url, params=params, timeout=15)
+            response = self.session.get(_ROUTE_URL, params=params, timeout=15)
             response.raise_for_status()
             
-            data = response.json()
-            logger.debug(f"Routing API response: {data}")
+            data = orjson.loads(response.content)
+            logger.debug("Routing API response: %s", data)
             
             # Check for API errors in response
             if "error" in data or "statusCode" in data:
                 error_msg = data.get("message", "Unknown API error")
-                logger.error(f"API returned error: {error_msg}")
+                logger.error("API returned error: %s", error_msg)
                 raise ValueError(f"Routing API error: {error_msg}")
             
             if not data.get("features"):
-                logger.error(f"No route features in response: {data}")
+                logger.error("No route features in response: %s", data)
                 raise ValueError("No route found for the given locations")
 
             feature = data["features"][0]
@@ -91,10 +195,10 @@ class TripSimulator:
             
             # Check if we have valid distance and time
             if "distance" not in props or "time" not in props:
-                logger.error(f"Missing distance or time in route properties: {props}")
+                logger.error("Missing distance or time in route properties: %s", props)
                 raise ValueError("Invalid route response - missing distance or time")
             
-            dist_miles = props["distance"] * 0.000621371
+            dist_miles = props["distance"]
             time_hours = props["time"] / 3600
 
             return {
@@ -104,11 +208,11 @@ class TripSimulator:
                 "fuel_locations": waypoints or []
             }
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Routing API error: {e}")
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            logger.error("Routing API error: %s", e)
             raise ValueError(f"Route calculation failed: {str(e)}")
         except KeyError as e:
-            logger.error(f"Unexpected API response format: {e}")
+            logger.error("Unexpected API response format: %s", e)
             raise ValueError(f"Unexpected response format from routing API")
 
     def calculate_fuel_stops(self, total_distance):
@@ -117,133 +221,107 @@ class TripSimulator:
             return 0
         return ceil(total_distance / 1000) - 1
 
-    def create_eld_log_entry(self, status, hours, description, start_time, day_start):
-        """Create a standardized ELD log entry"""
-        elapsed_hours = (start_time - day_start).total_seconds() / 3600
-        return {
-            "status": status,
-            "hours": hours,
-            "description": description,
-            "start_time": start_time.isoformat(),
-            "elapsed_hours": round(elapsed_hours % 24, 2)
-        }
-
     def simulate_trip_timeline(self, total_driving_hours, total_distance, num_fuel_stops):
         """Simulate the complete trip timeline with ELD compliance"""
-        events = []
-        daily_logs = []
-        
         now = datetime.now()
         current_day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        current_log = {
-            "date": current_day_start.date().isoformat(),
-            "entries": [],
-            "total_driving": 0,
-            "total_on_duty": 0
-        }
         
         # Simplified simulation for short distances
-        driving_remaining = total_driving_hours
-        
-        # Driving to pickup
-        drive_segment = min(driving_remaining, 2.0)
-        events.append({
-            "type": "drive",
-            "hours": drive_segment,
-            "note": "Driving to pickup location",
-            "start": now.isoformat()
-        })
-        current_log["entries"].append(self.create_eld_log_entry(
-            "D", drive_segment, "Driving to pickup", now, current_day_start
-        ))
-        driving_remaining -= drive_segment
-        now += timedelta(hours=drive_segment)
-        
-        # Pickup
-        events.append({
-            "type": "pickup",
-            "hours": self.pickup_time,
-            "note": "Loading at pickup location",
-            "start": now.isoformat()
-        })
-        current_log["entries"].append(self.create_eld_log_entry(
-            "ON", self.pickup_time, "Loading", now, current_day_start
-        ))
-        now += timedelta(hours=self.pickup_time)
-        
-        # Main driving
+        drive_segment = min(total_driving_hours, 2.0)
+        driving_remaining = total_driving_hours - drive_segment
+
+        # (event type, ELD status, hours, event note, log description)
+        segments = [
+            ("drive", "D", drive_segment, "Driving to pickup location", "Driving to pickup"),
+            ("pickup", "ON", self.pickup_time, "Loading at pickup location", "Loading"),
+        ]
         if driving_remaining > 0:
+            segments.append(("drive", "D", driving_remaining, "Main route to destination", "Route driving"))
+        segments.append(("dropoff", "ON", self.dropoff_time, "Unloading at destination", "Unloading"))
+
+        # Events and log entries are built together in one pass over the segments.
+        # Hours since midnight are tracked as a running total rather than
+        # re-derived from datetimes for every entry.
+        elapsed_hours = (now - current_day_start).total_seconds() / 3600
+        events = []
+        entries = []
+        for event_type, eld_status, hours, note, description in segments:
+            # The event and its log entry start at the same moment
+            now_iso = now.isoformat()
             events.append({
-                "type": "drive",
-                "hours": driving_remaining,
-                "note": "Main route to destination",
-                "start": now.isoformat()
+                "type": event_type,
+                "hours": hours,
+                "note": note,
+                "start": now_iso
             })
-            current_log["entries"].append(self.create_eld_log_entry(
-                "D", driving_remaining, "Route driving", now, current_day_start
-            ))
-            now += timedelta(hours=driving_remaining)
-        
-        # Dropoff
-        events.append({
-            "type": "dropoff",
-            "hours": self.dropoff_time,
-            "note": "Unloading at destination",
-            "start": now.isoformat()
-        })
-        current_log["entries"].append(self.create_eld_log_entry(
-            "ON", self.dropoff_time, "Unloading", now, current_day_start
-        ))
+            entries.append({
+                "status": eld_status,
+                "hours": hours,
+                "description": description,
+                "start_time": now_iso,
+                "elapsed_hours": int((elapsed_hours % 24) * 100 + 0.5) / 100
+            })
+            now += timedelta(hours=hours)
+            elapsed_hours += hours
         
-        # Finalize log
-        current_log["total_driving"] = total_driving_hours
-        current_log["total_on_duty"] = total_driving_hours + self.pickup_time + self.dropoff_time
-        daily_logs.append(current_log)
+        daily_logs = [{
+            "date": current_day_start.date().isoformat(),
+            "entries": entries,
+            "total_driving": total_driving_hours,
+            "total_on_duty": total_driving_hours + self.pickup_time + self.dropoff_time
+        }]
         
         return events, daily_logs
 
     def simulate(self, current_addr, pickup_addr, dropoff_addr):
-        logger.info(f"Starting simulation: {current_addr} -> {pickup_addr} -> {dropoff_addr}")
+        logger.info("Starting simulation: %s -> %s -> %s", current_addr, pickup_addr, dropoff_addr)
         
         if self.remaining_cycle < 10:
             raise ValueError("Insufficient cycle hours remaining (minimum 10 required)")
 
         try:
-            # Geocode all addresses
-            current_coords = self.geocode(current_addr)
-            pickup_coords = self.geocode(pickup_addr)
-            dropoff_coords = self.geocode(dropoff_addr)
+            # Geocode all addresses concurrently - the lookups are independent
+            # and dominated by network latency
+            current_coords, pickup_coords, dropoff_coords = self.geocode_batch(
+                [current_addr, pickup_addr, dropoff_addr]
+            )
             
-            logger.info(f"Geocoded coordinates: current={current_coords}, pickup={pickup_coords}, dropoff={dropoff_coords}")
+            logger.info(
+                "Geocoded coordinates: current=%s, pickup=%s, dropoff=%s",
+                current_coords, pickup_coords, dropoff_coords
+            )
 
-            # Calculate routes - for short trips, use direct routing without waypoints
-            route_to_pickup = self.get_route(current_coords, pickup_coords)
-            logger.info(f"Route to pickup: {route_to_pickup['distance']} miles, {route_to_pickup['duration']} hours")
-            
-            main_route = self.get_route(pickup_coords, dropoff_coords)
-            logger.info(f"Main route: {main_route['distance']} miles, {main_route['duration']} hours")
+            # Calculate routes - for short trips, use direct routing without waypoints.
+            # Both legs only depend on the geocoded points, so fetch them together.
+            fut_to_pickup = _IO_POOL.submit(self.get_route, current_coords, pickup_coords)
+            fut_main = _IO_POOL.submit(self.get_route, pickup_coords, dropoff_coords)
+            route_to_pickup = fut_to_pickup.result()
+            main_route = fut_main.result()
+
+            logger.info("Route to pickup: %s miles, %s hours", route_to_pickup['distance'], route_to_pickup['duration'])
+            logger.info("Main route: %s miles, %s hours", main_route['distance'], main_route['duration'])
             
             total_distance = route_to_pickup['distance'] + main_route['distance']
             total_driving_hours = route_to_pickup['duration'] + main_route['duration']
             
-            logger.info(f"Total route: {total_distance} miles, {total_driving_hours} hours")
+            logger.info("Total route: %s miles, %s hours", total_distance, total_driving_hours)
 
             # Calculate fuel stops
             num_fuel_stops = self.calculate_fuel_stops(total_distance)
             
-            # Generate simplified fuel locations
-            fuel_locations = []
-            if num_fuel_stops > 0:
-                for i in range(num_fuel_stops):
-                    fraction = (i + 1) / (num_fuel_stops + 1)
-                    lat = pickup_coords[0] + fraction * (dropoff_coords[0] - pickup_coords[0])
-                    lng = pickup_coords[1] + fraction * (dropoff_coords[1] - pickup_coords[1])
-                    fuel_locations.append({
-                        "lat": round(lat, 6),
-                        "lng": round(lng, 6),
-                        "name": f"Fuel Stop {i+1}",
-                        "distance_from_start": round((i + 1) * 1000, 1)
-                    })
+            # Generate simplified fuel locations, evenly spaced between pickup and dropoff
+            start_lat, start_lng = pickup_coords
+            step_lat = (dropoff_coords[0] - start_lat) / (num_fuel_stops + 1)
+            step_lng = (dropoff_coords[1] - start_lng) / (num_fuel_stops + 1)
+            fuel_locations = [
+                {
+                    "lat": round(start_lat + n * step_lat, 6),
+                    "lng": round(start_lng + n * step_lng, 6),
+                    "name": f"Fuel Stop {n}",
+                    "distance_from_start": n * 1000
+                }
+                for n in range(1, num_fuel_stops + 1)
+            ]
             
             # Simulate timeline
             events, daily_logs = self.simulate_trip_timeline(
@@ -264,5 +342,18 @@ class TripSimulator:
             }
             
         except Exception as e:
-            logger.error(f"Simulation error: {str(e)}", exc_info=True)
-            raise ValueError(f"Simulation failed: {str(e)}")
\ No newline at end of file
+            # Tracebacks only when debugging - most failures here are bad addresses
+            logger.error("Simulation error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            raise ValueError(f"Simulation failed: {str(e)}")
+
+    async def asimulate(self, current_addr, pickup_addr, dropoff_addr):
+        """Async entry point for simulate(), run off the event loop.
+
+        This is not async I/O: the blocking simulate() holds a _SIMULATION_POOL
+        thread for its whole run, so at most _MAX_CONCURRENT_REQUESTS
+        simulations are in flight per process.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _SIMULATION_POOL, self.simulate, current_addr, pickup_addr, dropoff_addr
+        )
@@ -1,3 +1,223 @@
-from django.test import TestCase
+import asyncio
+import threading
+from datetime import datetime
+from unittest import mock
 
-# Create your tests here.
+import orjson
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from . import simulator
+from .simulator import TripSimulator
+
+COORDS = {
+    "Denver": (39.7392, -104.9903),
+    "Chicago": (41.8781, -87.6298),
+    "Dallas": (32.7767, -96.7970),
+}
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 1, 1, 21, 30)
+
+
+def _fake_response(payload):
+    response = mock.Mock()
+    response.content = orjson.dumps(payload)
+    return response
+
+
+def _fake_get(url, params=None, timeout=None):
+    """Stand-in for the Geoapify API keyed on the request URL"""
+    if url == simulator._GEOCODE_URL:
+        lat, lon = COORDS[params["text"].strip().title()]
+        return _fake_response({"results": [{"lat": lat, "lon": lon}]})
+    return _fake_response({
+        "features": [{
+            "geometry": {"type": "LineString", "coordinates": []},
+            "properties": {"distance": 500.0, "time": 9 * 3600},
+        }]
+    })
+
+
+class SimulatorCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(simulator._SESSION, "get", side_effect=_fake_get)
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sim = TripSimulator(geoapify_token="test-token")
+
+    def api_calls(self, url):
+        return [c for c in self.get.call_args_list if c.args[0] == url]
+
+    def test_geocode_cache_key_is_normalized(self):
+        self.assertEqual(self.sim.geocode("Denver"), COORDS["Denver"])
+        self.assertEqual(self.sim.geocode("  DENVER \n"), COORDS["Denver"])
+        self.assertEqual(len(self.api_calls(simulator._GEOCODE_URL)), 1)
+
+    def test_geocode_batch_keeps_order_and_dedupes(self):
+        coords = self.sim.geocode_batch(["Chicago", "denver ", "Denver", "Chicago"])
+        self.assertEqual(
+            coords,
+            [COORDS["Chicago"], COORDS["Denver"], COORDS["Denver"], COORDS["Chicago"]]
+        )
+        self.assertEqual(len(self.api_calls(simulator._GEOCODE_URL)), 2)
+
+    def test_geocode_batch_caches_misses(self):
+        with mock.patch.object(simulator.cache, "set_many", wraps=cache.set_many) as set_many:
+            self.sim.geocode_batch(["Chicago", "Denver"])
+        set_many.assert_called_once()
+        self.assertEqual(self.sim.geocode_batch(["chicago", "denver"]), [COORDS["Chicago"], COORDS["Denver"]])
+        self.assertEqual(len(self.api_calls(simulator._GEOCODE_URL)), 2)
+
+    def test_route_cache_key_is_rounded(self):
+        self.sim.get_route((39.73921, -104.99031), (41.87811, -87.62981))
+        self.sim.get_route((39.73924, -104.99034), (41.87814, -87.62984))
+        self.assertEqual(len(self.api_calls(simulator._ROUTE_URL)), 1)
+
+    def test_route_to_same_point_skips_api(self):
+        route = self.sim.get_route(COORDS["Denver"], COORDS["Denver"])
+        self.assertEqual(route["distance"], 0.0)
+        self.assertEqual(route["duration"], 0.0)
+        self.assertEqual(route["fuel_locations"], [])
+        self.get.assert_not_called()
+
+
+class SimulatorTests(SimpleTestCase):
+    def setUp(self):
+        self.sim = TripSimulator(geoapify_token="test-token")
+
+    def timeline(self, total_driving_hours):
+        with mock.patch.object(simulator, "datetime", _FrozenDatetime):
+            return self.sim.simulate_trip_timeline(total_driving_hours, 0, 0)
+
+    def test_asimulate_runs_on_simulation_pool(self):
+        with mock.patch.object(
+            self.sim, "simulate", side_effect=lambda *args: threading.current_thread().name
+        ):
+            thread_name = asyncio.run(self.sim.asimulate("Origin", "Pickup", "Dropoff"))
+        self.assertTrue(thread_name.startswith("simulate"))
+
+    def test_timeline_events(self):
+        events, daily_logs = self.timeline(5.0)
+        self.assertEqual(events, [
+            {"type": "drive", "hours": 2.0, "note": "Driving to pickup location", "start": "2025-01-01T21:30:00"},
+            {"type": "pickup", "hours": 1, "note": "Loading at pickup location", "start": "2025-01-01T23:30:00"},
+            {"type": "drive", "hours": 3.0, "note": "Main route to destination", "start": "2025-01-02T00:30:00"},
+            {"type": "dropoff", "hours": 1, "note": "Unloading at destination", "start": "2025-01-02T03:30:00"},
+        ])
+
+        self.assertEqual(len(daily_logs), 1)
+        log = daily_logs[0]
+        self.assertEqual(log["date"], "2025-01-01")
+        self.assertEqual(log["total_driving"], 5.0)
+        self.assertEqual(log["total_on_duty"], 7.0)
+        self.assertEqual(
+            [(e["status"], e["hours"], e["description"]) for e in log["entries"]],
+            [("D", 2.0, "Driving to pickup"), ("ON", 1, "Loading"),
+             ("D", 3.0, "Route driving"), ("ON", 1, "Unloading")]
+        )
+
+    def test_timeline_entries_share_event_start(self):
+        events, daily_logs = self.timeline(5.0)
+        self.assertEqual(
+            [e["start_time"] for e in daily_logs[0]["entries"]],
+            [e["start"] for e in events]
+        )
+
+    def test_timeline_elapsed_hours_wrap_at_midnight(self):
+        _, daily_logs = self.timeline(5.0)
+        self.assertEqual(
+            [e["elapsed_hours"] for e in daily_logs[0]["entries"]],
+            [21.5, 23.5, 0.5, 3.5]
+        )
+
+    def test_timeline_elapsed_hours_round_half_up(self):
+        # 21.5 + 1.625 is exactly 23.125, which rounds up rather than to even
+        _, daily_logs = self.timeline(1.625)
+        self.assertEqual(daily_logs[0]["entries"][1]["elapsed_hours"], 23.13)
+
+    def test_short_timeline_skips_main_drive(self):
+        events, daily_logs = self.timeline(1.5)
+        self.assertEqual([e["type"] for e in events], ["drive", "pickup", "dropoff"])
+        self.assertEqual(events[0]["hours"], 1.5)
+        self.assertEqual(len(daily_logs[0]["entries"]), 3)
+
+    def test_fuel_stops_evenly_spaced(self):
+        coords = [(0.0, 0.0), (30.0, -90.0), (33.0, -96.0)]
+        route = {"geojson": {}, "distance": 1250.0, "duration": 10.0, "fuel_locations": []}
+        with mock.patch.object(self.sim, "geocode_batch", return_value=coords), \
+                mock.patch.object(self.sim, "get_route", return_value=route):
+            result = self.sim.simulate("Origin", "Pickup", "Dropoff")
+
+        self.assertEqual(result["fuel_stops"], 2)
+        self.assertEqual(result["fuel_locations"], [
+            {"lat": 31.0, "lng": -92.0, "name": "Fuel Stop 1", "distance_from_start": 1000},
+            {"lat": 32.0, "lng": -94.0, "name": "Fuel Stop 2", "distance_from_start": 2000},
+        ])
+
+
+class SimulateTripViewTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(simulator._SESSION, "get", side_effect=_fake_get)
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse("simulate_trip")
+        self.payload = {
+            "current_location": "Denver",
+            "pickup_location": "Chicago",
+            "dropoff_location": "Dallas",
+            "current_cycle_used": "12",
+            "geoapify_token": "test-token",
+        }
+
+    def post(self, payload):
+        return self.client.post(self.url, data=payload, content_type="application/json")
+
+    def assertValidationError(self, response):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response["Content-Type"], "application/json")
+        body = response.json()
+        self.assertEqual(body["type"], "validation_error")
+        self.assertIn("error", body)
+
+    def test_simulate_success(self):
+        response = self.post(self.payload)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["status"], "success")
+        self.assertEqual(body["total_distance"], 1000.0)
+        self.assertEqual(body["remaining_cycle_hours"], 38.0)
+
+    def test_missing_field(self):
+        del self.payload["pickup_location"]
+        self.assertValidationError(self.post(self.payload))
+
+    def test_non_numeric_cycle_used(self):
+        self.payload["current_cycle_used"] = "abc"
+        self.assertValidationError(self.post(self.payload))
+
+    def test_null_cycle_used(self):
+        self.payload["current_cycle_used"] = None
+        self.assertValidationError(self.post(self.payload))
+
+    def test_malformed_json(self):
+        response = self.client.post(self.url, data=b"{", content_type="application/json")
+        self.assertValidationError(response)
+
+    def test_form_post_rejected(self):
+        response = self.client.post(self.url, data=self.payload)
+        self.assertEqual(response.status_code, 415)
+        self.assertIn("detail", response.json())
+        self.get.assert_not_called()
+
+    def test_get_not_allowed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response["Allow"], "POST")
+        self.assertIn("detail", response.json())
@@ -1,65 +1,87 @@
-from rest_framework.response import Response
 from django.shortcuts import render
 from django.http import HttpResponse
-from rest_framework.decorators import api_view
-from rest_framework import status
+from django.views.decorators.csrf import csrf_exempt
+from http import HTTPStatus
 import logging
-import json
+import msgspec
+import orjson
 from .simulator import TripSimulator
 
 logger = logging.getLogger(__name__)
 
-@api_view(['POST'])
-def simulate_trip(request):
+
+class TripRequest(msgspec.Struct):
+    current_location: str
+    pickup_location: str
+    dropoff_location: str
+    current_cycle_used: int = 0
+    geoapify_token: str | None = None
+
+
+def _json_response(data, status_code=HTTPStatus.OK):
+    return HttpResponse(orjson.dumps(data), status=status_code, content_type='application/json')
+
+
+@csrf_exempt
+async def simulate_trip(request):
+    if request.method != 'POST':
+        response = _json_response(
+            {'detail': f'Method "{request.method}" not allowed.'},
+            status_code=HTTPStatus.METHOD_NOT_ALLOWED
+        )
+        response['Allow'] = 'POST'
+        return response
+
+    # Only JSON bodies are accepted; form and multipart posts are rejected up front
+    if request.content_type != 'application/json':
+        return _json_response(
+            {'detail': f'Unsupported media type "{request.content_type}" in request.'},
+            status_code=HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+        )
+
     try:
-        data = request.data
-        
         # Log the incoming request for debugging
-        logger.info(f"Received trip simulation request: {json.dumps(data)}")
-        
-        # Validate required fields
-        required_fields = ['current_location', 'pickup_location', 'dropoff_location']
-        for field in required_fields:
-            if field not in data:
-                logger.warning(f"Missing required field: {field}")
-                return Response(
-                    {'error': f'Missing required field: {field}', 'type': 'validation_error'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Received trip simulation request: %s", request.body.decode(errors='replace'))
         
-        # Safely parse current_cycle_used
+        # Decode and validate the payload in a single pass; strict=False lets
+        # numeric strings such as "12" through for current_cycle_used
         try:
-            current_cycle_used = int(data.get('current_cycle_used', 0))
-        except (ValueError, TypeError):
-            current_cycle_used = 0
+            trip = msgspec.json.decode(request.body, type=TripRequest, strict=False)
+        except msgspec.DecodeError as e:
+            logger.warning("Invalid trip simulation request: %s", e)
+            return _json_response(
+                {'error': str(e), 'type': 'validation_error'},
+                status_code=HTTPStatus.BAD_REQUEST
+            )
 
         # Initialize simulator
         sim = TripSimulator(
-            geoapify_token=data.get('geoapify_token'),
-            current_cycle_used=current_cycle_used
+            geoapify_token=trip.geoapify_token,
+            current_cycle_used=trip.current_cycle_used
         )
         
-        # Run simulation
-        result = sim.simulate(
-            data['current_location'],
-            data['pickup_location'],
-            data['dropoff_location']
+        # Run simulation without holding the event loop
+        result = await sim.asimulate(
+            trip.current_location,
+            trip.pickup_location,
+            trip.dropoff_location
         )
         
-        logger.info(f"Simulation completed successfully: {result.get('total_distance', 'N/A')} miles")
-        return Response(result)
+        logger.info("Simulation completed successfully: %s miles", result.get('total_distance', 'N/A'))
+        return _json_response(result)
         
     except ValueError as e:
-        logger.error(f"Validation error in simulation: {str(e)}")
-        return Response(
+        logger.error("Validation error in simulation: %s", e)
+        return _json_response(
             {'error': str(e), 'type': 'validation_error'},
-            status=status.HTTP_400_BAD_REQUEST
+            status_code=HTTPStatus.BAD_REQUEST
         )
     except Exception as e:
-        logger.error(f"Unexpected error in simulation: {str(e)}", exc_info=True)
-        return Response(
+        logger.error("Unexpected error in simulation: %s", e, exc_info=True)
+        return _json_response(
             {'error': 'Internal server error', 'details': str(e)},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR
         )
 
 def home(request):